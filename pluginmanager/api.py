@@ -1,15 +1,26 @@
 """API routes for pluginmanager plugin - handles install/uninstall/update of third-party plugins."""
 
+import codecs
+import configparser
+import gzip
+import hashlib
+import itertools
+import json
 import os
+import platform
 import subprocess
 import threading
 import uuid
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, send_from_directory
 import logging
 
+from .patch_core import check_core_patched_cached
+
 logger = logging.getLogger(__name__)
 
 plugin_manage_bp = Blueprint("pluginmanager_api", __name__)
@@ -19,21 +30,34 @@ plugin_manage_bp = Blueprint("pluginmanager_api", __name__)
 # ---------------------------------------------------------------------------
 
 _JOBS: dict = {}         # job_id -> job dict
-_JOBS_LOCK = threading.Lock()
-_JOB_TTL = 300           # auto-expire jobs after 5 minutes
+_JOBS_LOCK = threading.Lock()   # guards registry writes and iteration
+_LOCK_FREE_JOB_READS = platform.python_implementation() == "CPython"
+_JOB_TTL = 300           # auto-expire jobs 5 minutes after they finish
+_JOB_MAX_LINES = 10000   # per-job output buffer cap; oldest lines are dropped first
+_STREAM_MAX_SECONDS = 5  # each job stream is closed after this long; the client reconnects
+_INFLIGHT: set = set()   # plugin ids with an uninstall/update job queued or running (guarded by _JOBS_LOCK)
+
+# Bounded worker pool for CLI jobs — caps concurrent installs so a burst of
+# requests cannot fork an unbounded number of git/pip processes on the Pi.
+_JOB_MAX_WORKERS = 2
+_EXECUTOR = ThreadPoolExecutor(max_workers=_JOB_MAX_WORKERS, thread_name_prefix="pluginmanager-job")
 
 
 def _create_job():
     """Create a new job entry and return (job_id, job)."""
     job_id = str(uuid.uuid4())
     job = {
-        "lines": [],
+        "lines": deque(maxlen=_JOB_MAX_LINES),
+        "base_offset": 0,  # absolute index of lines[0] once old lines have been dropped
+        "total": 0,        # lines written over the job's lifetime
         "done": False,
         "success": None,
         "error": None,
         "created_at": time.time(),
+        "finished_at": None,  # set when the job is done; queued/running jobs are never purged
         "lock": threading.Lock(),
     }
+    job["cond"] = threading.Condition(job["lock"])  # notified on new output and on completion
     with _JOBS_LOCK:
         _JOBS[job_id] = job
     return job_id, job
@@ -41,25 +65,109 @@ def _create_job():
 
 def _get_job(job_id):
     """Return the job dict for job_id, or None if not found."""
+    # A single-key dict read is atomic under CPython, so the hot polling path skips
+    # the registry lock there; other interpreters keep taking it
+    if _LOCK_FREE_JOB_READS:
+        return _JOBS.get(job_id)
     with _JOBS_LOCK:
         return _JOBS.get(job_id)
 
 
+def _claim_plugin(plugin_id):
+    """Mark plugin_id as busy. Returns False if another job already holds it."""
+    with _JOBS_LOCK:
+        if plugin_id in _INFLIGHT:
+            return False
+        _INFLIGHT.add(plugin_id)
+        return True
+
+
+def _release_plugin(plugin_id):
+    """Clear the busy mark set by _claim_plugin."""
+    with _JOBS_LOCK:
+        _INFLIGHT.discard(plugin_id)
+
+
 def _purge_old_jobs():
-    """Remove jobs older than _JOB_TTL. Called lazily before each new operation."""
+    """Remove jobs that finished more than _JOB_TTL ago. Run periodically by the purge thread."""
     cutoff = time.time() - _JOB_TTL
+    # Snapshot under the lock (iteration must not race _create_job); on CPython the
+    # single-key pops are atomic and can run after the lock is released
+    with _JOBS_LOCK:
+        expired = [
+            jid for jid, j in _JOBS.items()
+            if j["finished_at"] is not None and j["finished_at"] < cutoff
+        ]
+        if not _LOCK_FREE_JOB_READS:
+            for jid in expired:
+                del _JOBS[jid]
+            return
+    for jid in expired:
+        _JOBS.pop(jid, None)
+
+
+_PURGE_INTERVAL = 60     # seconds between job registry sweeps
+_PURGE_THREAD_STARTED = False
+
+
+def _purge_loop():
+    """Sweep expired jobs forever, off the request path."""
+    while True:
+        time.sleep(_PURGE_INTERVAL)
+        try:
+            _purge_old_jobs()
+        except Exception:
+            logger.exception("Job purge failed")
+
+
+def _start_purge_thread():
+    """Start the purge thread once; later calls are no-ops."""
+    global _PURGE_THREAD_STARTED
     with _JOBS_LOCK:
-        expired = [jid for jid, j in _JOBS.items() if j["created_at"] < cutoff]
-        for jid in expired:
-            del _JOBS[jid]
+        if _PURGE_THREAD_STARTED:
+            return
+        _PURGE_THREAD_STARTED = True
+    threading.Thread(target=_purge_loop, name="pluginmanager-purge", daemon=True).start()
+
+
+_start_purge_thread()
 
 
 # ---------------------------------------------------------------------------
 # Background subprocess runner
 # ---------------------------------------------------------------------------
 
+_READ_CHUNK_SIZE = 65536
+
+
+def _split_lines(text):
+    """Split text on any newline convention (like text-mode universal newlines)."""
+    return text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+
+def _append_job_lines(job, lines):
+    """Append the non-empty lines to the job buffer in a single locked batch."""
+    lines = [line for line in lines if line]
+    if lines:
+        with job["lock"]:
+            job["lines"].extend(lines)
+            job["total"] += len(lines)
+            job["base_offset"] = job["total"] - len(job["lines"])
+            job["cond"].notify_all()
+
+
+def _finish_job(job, success, error):
+    """Mark the job done and wake any streaming readers."""
+    with job["lock"]:
+        job["done"] = True
+        job["success"] = success
+        job["error"] = error
+        job["finished_at"] = time.time()
+        job["cond"].notify_all()
+
+
 def _run_subprocess_job(job_id, cmd, env, cwd, success_marker):
-    """Run cmd in a background thread, streaming stdout/stderr lines into the job buffer."""
+    """Run cmd on a job worker, streaming stdout/stderr lines into the job buffer."""
     job = _get_job(job_id)
     if not job:
         return
@@ -70,31 +178,59 @@ def _run_subprocess_job(job_id, cmd, env, cwd, success_marker):
             cwd=cwd,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,  # merge stderr into stdout for a single stream
-            text=True,
-            bufsize=1,                 # line-buffered
         )
-        for raw_line in proc.stdout:
-            line = raw_line.rstrip("\n")
-            if line:
-                with job["lock"]:
-                    job["lines"].append(line)
+        # Read in bulk chunks and publish each batch of lines under one lock acquisition
+        # instead of decoding and locking once per line
+        fd = proc.stdout.fileno()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        # Watch for the success marker as lines arrive rather than re-joining the
+        # whole buffer at the end (which would also miss lines dropped by the cap)
+        marker_seen = False
+        while True:
+            chunk = os.read(fd, _READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            *complete, pending = _split_lines(pending + decoder.decode(chunk))
+            if not marker_seen:
+                marker_seen = any(success_marker in line for line in complete)
+            _append_job_lines(job, complete)
+        tail = _split_lines(pending + decoder.decode(b"", final=True))
+        if not marker_seen:
+            marker_seen = any(success_marker in line for line in tail)
+        _append_job_lines(job, tail)
+        proc.stdout.close()
         proc.wait()
-        all_output = "\n".join(job["lines"])
-        succeeded = success_marker in all_output or proc.returncode == 0
-        with job["lock"]:
-            job["done"] = True
-            job["success"] = succeeded
-            job["error"] = None if succeeded else "Operation failed — see output above"
+        succeeded = marker_seen or proc.returncode == 0
+        _finish_job(job, succeeded, None if succeeded else "Operation failed — see output above")
     except Exception as e:
         logger.exception("Background job %s raised an exception", job_id)
-        with job["lock"]:
-            job["lines"].append(f"[ERROR] Unexpected error: {e}")
-            job["done"] = True
-            job["success"] = False
-            job["error"] = str(e)
+        _append_job_lines(job, [f"[ERROR] Unexpected error: {e}"])
+        _finish_job(job, False, str(e))
+
+
+# Guards the read-modify-write of device_config._plugins_rev; two job workers can finish at once
+_PLUGINS_REV_LOCK = threading.Lock()
+
+
+def _run_cli_job(job_id, cmd, env, cwd, success_marker, plugin_id=None, device_config=None):
+    """Run _run_subprocess_job for a CLI operation, then clean up after it.
+
+    Releases the plugin claim (if any) and bumps device_config._plugins_rev, since
+    the CLI may have added, replaced or removed plugins. The settings page keys its
+    cached third-party list (device_config._third_party) on that counter.
+    """
+    try:
+        _run_subprocess_job(job_id, cmd, env, cwd, success_marker)
+    finally:
+        if plugin_id:
+            _release_plugin(plugin_id)
+        if device_config is not None:
+            with _PLUGINS_REV_LOCK:
+                device_config._plugins_rev = getattr(device_config, "_plugins_rev", 0) + 1
 
 
-def _project_dir():
+def _compute_project_dir():
     """Project root (parent of src/)."""
     # Get BASE_DIR from config, go up one level
     try:
@@ -105,16 +241,20 @@ def _project_dir():
         return os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 
-def _cli_script():
-    """Path to the inkypi-plugin CLI script in the pluginmanager plugin."""
-    plugin_dir = os.path.dirname(__file__)
-    return os.path.join(plugin_dir, "inkypi-plugin")
+# Static for the lifetime of the server — resolved once instead of per request
+_PLUGIN_DIR = os.path.dirname(__file__)
+_PROJECT_DIR = _compute_project_dir()
+_CLI_SCRIPT = os.path.join(_PLUGIN_DIR, "inkypi-plugin")  # inkypi-plugin CLI script
+_CLI_SCRIPT_EXISTS = os.path.isfile(_CLI_SCRIPT)
 
 
-def _third_party_plugins():
-    """Plugins that have a repository (third-party)."""
+def _third_party_plugins_by_id():
+    """Plugins that have a repository (third-party), keyed by plugin id."""
     device_config = current_app.config["DEVICE_CONFIG"]
-    return [p for p in device_config.get_plugins() if p.get("repository")]
+    return {p["id"]: p for p in device_config.get_plugins() if p.get("repository")}
+
+
+_ALLOWED_HOSTS = frozenset(("github.com", "www.github.com"))
 
 
 def _validate_install_url(url):
@@ -132,12 +272,174 @@ def _validate_install_url(url):
         return False, "Only HTTPS URLs are allowed"
     if not parsed.netloc:
         return False, "Invalid URL host"
-    host = parsed.netloc.lower().split(":")[0]  # strip port if present
-    if host not in ("github.com", "www.github.com"):
+    # Credentials would be handed to the CLI and stored as the plugin's repository URL
+    if parsed.username is not None or parsed.password is not None:
+        return False, "URLs with embedded credentials are not allowed"
+    host = parsed.hostname or ""  # already lowercased, port and userinfo stripped
+    if host not in _ALLOWED_HOSTS:
         return False, "Only GitHub.com repository URLs are accepted"
     return True, None
 
 
+# ---------------------------------------------------------------------------
+# Git helpers
+# ---------------------------------------------------------------------------
+
+# Lets check_updates_batch run ls-remote against several remotes at once
+_GIT_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="pluginmanager-git")
+
+# Non-interactive, lock-free git: never prompt for credentials, skip optional
+# lock files, and keep output locale-independent
+_GIT_ENV = {**os.environ, "GIT_TERMINAL_PROMPT": "0", "GIT_OPTIONAL_LOCKS": "0", "LC_ALL": "C"}
+
+
+def _read_head_commit(plugin_dir):
+    """Resolve HEAD to a commit hash by reading .git directly. Returns None if it cannot be resolved.
+
+    Equivalent to `git rev-parse HEAD` for ordinary clones, without forking git.
+    """
+    git_dir = os.path.join(plugin_dir, ".git")
+    try:
+        with open(os.path.join(git_dir, "HEAD"), "r") as f:
+            head = f.read().strip()
+        if not head.startswith("ref: "):
+            return head or None  # detached HEAD holds the hash itself
+        ref = head[len("ref: "):]
+        ref_path = os.path.join(git_dir, *ref.split("/"))
+        if os.path.isfile(ref_path):
+            with open(ref_path, "r") as f:
+                return f.read().strip() or None
+        # Loose ref missing — it may have been packed by `git gc`
+        with open(os.path.join(git_dir, "packed-refs"), "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    except (OSError, ValueError) as e:  # ValueError covers a non-UTF-8 HEAD or ref file
+        logger.debug(f"Could not read HEAD in {plugin_dir}: {e}")
+    return None
+
+
+def _read_origin_url(plugin_dir):
+    """Read remote.origin.url from .git/config. Returns None if it is not set."""
+    cfg = configparser.ConfigParser(strict=False, allow_no_value=True, interpolation=None)
+    try:
+        cfg.read(os.path.join(plugin_dir, ".git", "config"))
+        return cfg.get('remote "origin"', "url", fallback=None) or None
+    except (configparser.Error, ValueError) as e:  # ValueError covers a non-UTF-8 config
+        logger.debug(f"Could not parse git config in {plugin_dir}: {e}")
+        return None
+
+
+_LS_REMOTE_TTL = 60      # seconds a successful ls-remote result is reused
+_LS_REMOTE_CACHE: dict = {}  # remote_url -> (CompletedProcess, fetched_at)
+_LS_REMOTE_CACHE_LOCK = threading.Lock()
+
+
+def _git_ls_remote(remote_url, force=False):
+    """Run `git ls-remote --heads` against remote_url and return the CompletedProcess.
+
+    Successful results are cached per URL for _LS_REMOTE_TTL seconds so repeated
+    update checks skip the network round-trip; force=True bypasses the cache.
+    """
+    if not force:
+        with _LS_REMOTE_CACHE_LOCK:
+            cached = _LS_REMOTE_CACHE.get(remote_url)
+        if cached and time.monotonic() - cached[1] < _LS_REMOTE_TTL:
+            return cached[0]
+    # Protocol v2 lets the server advertise only the requested refs
+    result = subprocess.run(
+        ["git", "-c", "protocol.version=2", "ls-remote", "--heads", remote_url],
+        capture_output=True,
+        text=True,
+        timeout=30,
+        env=_GIT_ENV,
+    )
+    if result.returncode == 0:
+        with _LS_REMOTE_CACHE_LOCK:
+            _LS_REMOTE_CACHE[remote_url] = (result, time.monotonic())
+    return result
+
+
+def _parse_remote_head(ls_remote_output):
+    """Pick the default branch commit from `git ls-remote --heads` output.
+
+    Returns:
+        tuple: (remote_commit: str | None, default_branch: str | None)
+    """
+    # Format: <commit_hash>    refs/heads/<branch_name>
+    refs = {}  # full ref -> commit, in advertised order
+    for line in ls_remote_output.splitlines():
+        parts = line.split()
+        if len(parts) >= 2:
+            refs[parts[1]] = parts[0]
+    
+    # Try common branch names first
+    for branch_name in ("main", "master", "develop"):
+        remote_commit = refs.get(f"refs/heads/{branch_name}")
+        if remote_commit:
+            return remote_commit, branch_name
+    
+    # If no common branch found, use the first ref
+    if refs:
+        ref_path, remote_commit = next(iter(refs.items()))
+        return remote_commit, ref_path[len("refs/heads/"):] if ref_path.startswith("refs/heads/") else None
+    
+    return None, None
+
+
+def _update_status(local_commit, remote_commit):
+    """Build the has_updates/commits_behind part of a check-updates response."""
+    # No remote commit means we cannot tell — report up to date
+    # With shallow clones, we can't reliably count commits behind, so we just check if they differ
+    if not remote_commit or local_commit == remote_commit:
+        return {"has_updates": False, "commits_behind": 0}
+    return {"has_updates": True, "commits_behind": 1}
+
+
+def _git_output_or_none(git_call, *args):
+    """Run a git helper and return its stdout, or None on failure or timeout.
+
+    Used by the batch check, which reports failures per plugin instead of failing the request.
+    """
+    try:
+        result = git_call(*args)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        logger.warning(f"{git_call.__name__}{args} failed: {e}")
+        return None
+    if result.returncode != 0:
+        logger.warning(f"{git_call.__name__}{args} failed: {result.stderr.strip()}")
+        return None
+    return result.stdout
+
+
+def _force_refresh_requested():
+    """True when the request asks to bypass the ls-remote cache (?force=true)."""
+    return request.args.get("force", "").lower() in ("1", "true", "yes")
+
+
+def _start_cli_job(cli_args, success_marker, plugin_id=None):
+    """Queue `inkypi-plugin <cli_args>` as a background job. Returns the Flask response.
+
+    When plugin_id is given the plugin is claimed for the job's duration, so a
+    second operation on it is rejected with 409 until the first one finishes.
+    """
+    if not _CLI_SCRIPT_EXISTS:
+        return jsonify({"success": False, "error": "Plugin CLI not found"}), 500
+
+    if plugin_id and not _claim_plugin(plugin_id):
+        return jsonify({"success": False, "error": "Another operation is already running for this plugin"}), 409
+
+    env = {**os.environ, "PROJECT_DIR": _PROJECT_DIR}
+    cmd = ["bash", _CLI_SCRIPT, *cli_args]
+
+    device_config = current_app.config.get("DEVICE_CONFIG")
+
+    job_id, _ = _create_job()
+    _EXECUTOR.submit(_run_cli_job, job_id, cmd, env, _PROJECT_DIR, success_marker, plugin_id, device_config)
+    return jsonify({"success": True, "job_id": job_id})
+
+
 @plugin_manage_bp.route("/pluginmanager-api/install", methods=["POST"])
 def install_plugin():
     """Install a plugin from a Git repository URL. Launches a background job and returns job_id."""
@@ -148,22 +450,7 @@ def install_plugin():
     if not ok:
         return jsonify({"success": False, "error": err}), 400
 
-    cli = _cli_script()
-    if not os.path.isfile(cli):
-        return jsonify({"success": False, "error": "Plugin CLI not found"}), 500
-
-    project_dir = _project_dir()
-    env = {**os.environ, "PROJECT_DIR": project_dir}
-
-    _purge_old_jobs()
-    job_id, _ = _create_job()
-    thread = threading.Thread(
-        target=_run_subprocess_job,
-        args=(job_id, ["bash", cli, "install-from-url", url.strip()], env, project_dir, "[INFO] Done"),
-        daemon=True,
-    )
-    thread.start()
-    return jsonify({"success": True, "job_id": job_id})
+    return _start_cli_job(["install-from-url", url.strip()], "[INFO] Done")
 
 
 @plugin_manage_bp.route("/pluginmanager-api/uninstall", methods=["POST"])
@@ -175,40 +462,25 @@ def uninstall_plugin():
     if not plugin_id:
         return jsonify({"success": False, "error": "plugin_id is required"}), 400
 
-    third_party = _third_party_plugins()
-    allowed_ids = {p["id"] for p in third_party}
-    if plugin_id not in allowed_ids:
+    if plugin_id not in _third_party_plugins_by_id():
         return jsonify({"success": False, "error": "Plugin not found or cannot be uninstalled"}), 400
 
-    cli = _cli_script()
-    if not os.path.isfile(cli):
-        return jsonify({"success": False, "error": "Plugin CLI not found"}), 500
-
-    project_dir = _project_dir()
-    env = {**os.environ, "PROJECT_DIR": project_dir}
-
-    _purge_old_jobs()
-    job_id, _ = _create_job()
-    thread = threading.Thread(
-        target=_run_subprocess_job,
-        args=(job_id, ["bash", cli, "uninstall", plugin_id], env, project_dir, "Plugin successfully uninstalled"),
-        daemon=True,
-    )
-    thread.start()
-    return jsonify({"success": True, "job_id": job_id})
+    return _start_cli_job(["uninstall", plugin_id], "Plugin successfully uninstalled", plugin_id=plugin_id)
 
 
 @plugin_manage_bp.route("/pluginmanager-api/check-updates", methods=["POST"])
 def check_updates():
-    """Check if a plugin has updates available by comparing local and remote commits."""
+    """Check if a plugin has updates available by comparing local and remote commits.
+
+    Remote lookups are cached briefly; pass ?force=true to query the remote again.
+    """
     data = request.get_json() or {}
     plugin_id = (data.get("plugin_id") or "").strip()
 
     if not plugin_id:
         return jsonify({"success": False, "error": "plugin_id is required"}), 400
 
-    third_party = _third_party_plugins()
-    plugin_info = next((p for p in third_party if p["id"] == plugin_id), None)
+    plugin_info = _third_party_plugins_by_id().get(plugin_id)
     if not plugin_info:
         return jsonify({"success": False, "error": "Plugin not found"}), 400
 
@@ -225,89 +497,34 @@ def check_updates():
         if not os.path.isdir(git_dir):
             return jsonify({"success": False, "error": "Plugin is not a git repository"}), 400
         
-        # Get current local commit hash
-        local_commit_result = subprocess.run(
-            ["git", "-C", plugin_dir, "rev-parse", "HEAD"],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
+        # Local state comes straight from .git — no git process needed
+        local_commit = _read_head_commit(plugin_dir)
         
-        if local_commit_result.returncode != 0:
+        if not local_commit:
             logger.warning(f"Could not get local commit for {plugin_id}")
             return jsonify({"success": False, "error": "Could not determine current version"}), 500
         
-        local_commit = local_commit_result.stdout.strip()
-        
         # Get remote URL to query directly
-        remote_url_result = subprocess.run(
-            ["git", "-C", plugin_dir, "config", "--get", "remote.origin.url"],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
+        remote_url = _read_origin_url(plugin_dir)
         
-        if remote_url_result.returncode != 0:
+        if not remote_url:
             logger.warning(f"Could not get remote URL for {plugin_id}")
             return jsonify({"success": False, "error": "Could not determine remote repository"}), 500
         
-        remote_url = remote_url_result.stdout.strip()
-        
         # Use ls-remote to get the remote HEAD commit without needing to fetch
         # This works even with shallow clones
-        ls_remote_result = subprocess.run(
-            ["git", "ls-remote", "--heads", remote_url],
-            capture_output=True,
-            text=True,
-            timeout=30,
-        )
+        ls_remote_result = _git_ls_remote(remote_url, _force_refresh_requested())
         
         if ls_remote_result.returncode != 0:
             logger.warning(f"Could not query remote for {plugin_id}: {ls_remote_result.stderr}")
             return jsonify({"success": False, "error": "Failed to check remote repository"}), 500
         
-        # Parse ls-remote output to find the default branch
-        # Format: <commit_hash>    refs/heads/<branch_name>
-        remote_refs = ls_remote_result.stdout.strip().split("\n")
-        remote_commit = None
-        default_branch = None
-        
-        # Try common branch names first
-        for branch_name in ["main", "master", "develop"]:
-            for ref_line in remote_refs:
-                if f"refs/heads/{branch_name}" in ref_line:
-                    parts = ref_line.split()
-                    if len(parts) >= 1:
-                        remote_commit = parts[0]
-                        default_branch = branch_name
-                        break
-            if remote_commit:
-                break
-        
-        # If no common branch found, use the first ref
-        if not remote_commit and remote_refs:
-            first_ref = remote_refs[0]
-            parts = first_ref.split()
-            if len(parts) >= 2:
-                remote_commit = parts[0]
-                # Extract branch name from refs/heads/branch_name
-                ref_path = parts[1]
-                if "refs/heads/" in ref_path:
-                    default_branch = ref_path.replace("refs/heads/", "")
+        remote_commit, _ = _parse_remote_head(ls_remote_result.stdout)
         
         if not remote_commit:
             logger.warning(f"Could not determine remote commit for {plugin_id}")
-            return jsonify({"success": True, "has_updates": False, "commits_behind": 0})
         
-        # Compare commits directly
-        # With shallow clones, we can't reliably count commits behind, so we just check if they differ
-        if local_commit == remote_commit:
-            return jsonify({"success": True, "has_updates": False, "commits_behind": 0})
-        else:
-            # Commits differ - there are updates available
-            # Note: With shallow clones, we can't reliably count commits behind,
-            # but we know there's a difference, so updates are available
-            return jsonify({"success": True, "has_updates": True, "commits_behind": 1})
+        return jsonify({"success": True, **_update_status(local_commit, remote_commit)})
             
     except subprocess.TimeoutExpired:
         return jsonify({"success": False, "error": "Check updates timed out"}), 500
@@ -316,6 +533,70 @@ def check_updates():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@plugin_manage_bp.route("/pluginmanager-api/check-updates-batch", methods=["POST"])
+def check_updates_batch():
+    """Check several plugins for updates in one request. Returns results keyed by plugin_id.
+
+    ls-remote runs in parallel, once per unique remote URL, so plugins sharing a
+    repository share a single network round-trip.
+    """
+    data = request.get_json() or {}
+    plugin_ids = data.get("plugin_ids")
+
+    if not isinstance(plugin_ids, list) or not plugin_ids:
+        return jsonify({"success": False, "error": "plugin_ids must be a non-empty list"}), 400
+
+    try:
+        from config import Config
+        plugins_dir = os.path.join(Config.BASE_DIR, "plugins")
+        plugins_by_id = _third_party_plugins_by_id()
+
+        results = {}
+        plugin_dirs = {}  # plugin_id -> plugin_dir, for plugins that can be checked
+        for raw_id in plugin_ids:
+            plugin_id = raw_id.strip() if isinstance(raw_id, str) else ""
+            if not plugin_id or plugin_id in results or plugin_id in plugin_dirs:
+                continue
+            if plugin_id not in plugins_by_id:
+                results[plugin_id] = {"success": False, "error": "Plugin not found"}
+                continue
+            plugin_dir = os.path.join(plugins_dir, plugin_id)
+            if not os.path.isdir(os.path.join(plugin_dir, ".git")):
+                results[plugin_id] = {"success": False, "error": "Plugin is not a git repository"}
+                continue
+            plugin_dirs[plugin_id] = plugin_dir
+
+        ids = list(plugin_dirs)
+        local_commits = {pid: _read_head_commit(plugin_dirs[pid]) for pid in ids}
+        remote_urls = {pid: _read_origin_url(plugin_dirs[pid]) for pid in ids}
+
+        # One ls-remote per unique remote, shared by every plugin pointing at it
+        unique_urls = list({url for url in remote_urls.values() if url})
+        force = _force_refresh_requested()
+        ls_remote_outputs = _GIT_EXECUTOR.map(
+            _git_output_or_none, [_git_ls_remote] * len(unique_urls), unique_urls, [force] * len(unique_urls)
+        )
+        ls_remote_by_url = dict(zip(unique_urls, ls_remote_outputs))
+
+        for plugin_id in ids:
+            remote_url = remote_urls[plugin_id]
+            if not local_commits[plugin_id]:
+                results[plugin_id] = {"success": False, "error": "Could not determine current version"}
+            elif not remote_url:
+                results[plugin_id] = {"success": False, "error": "Could not determine remote repository"}
+            elif ls_remote_by_url[remote_url] is None:
+                results[plugin_id] = {"success": False, "error": "Failed to check remote repository"}
+            else:
+                remote_commit, _ = _parse_remote_head(ls_remote_by_url[remote_url])
+                results[plugin_id] = {"success": True, **_update_status(local_commits[plugin_id], remote_commit)}
+
+        return jsonify({"success": True, "results": results})
+
+    except Exception as e:
+        logger.exception("Failed to check for plugin updates")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @plugin_manage_bp.route("/pluginmanager-api/update", methods=["POST"])
 def update_plugin():
     """Update a third-party plugin by reinstalling from its repository. Launches a background job and returns job_id."""
@@ -325,8 +606,7 @@ def update_plugin():
     if not plugin_id:
         return jsonify({"success": False, "error": "plugin_id is required"}), 400
 
-    third_party = _third_party_plugins()
-    plugin_info = next((p for p in third_party if p["id"] == plugin_id), None)
+    plugin_info = _third_party_plugins_by_id().get(plugin_id)
     if not plugin_info:
         return jsonify({"success": False, "error": "Plugin not found or cannot be updated"}), 400
 
@@ -334,22 +614,24 @@ def update_plugin():
     if not repo_url:
         return jsonify({"success": False, "error": "Plugin repository URL not found"}), 400
 
-    cli = _cli_script()
-    if not os.path.isfile(cli):
-        return jsonify({"success": False, "error": "Plugin CLI not found"}), 500
-
-    project_dir = _project_dir()
-    env = {**os.environ, "PROJECT_DIR": project_dir}
-
-    _purge_old_jobs()
-    job_id, _ = _create_job()
-    thread = threading.Thread(
-        target=_run_subprocess_job,
-        args=(job_id, ["bash", cli, "install", plugin_id, repo_url], env, project_dir, "[INFO] Done"),
-        daemon=True,
-    )
-    thread.start()
-    return jsonify({"success": True, "job_id": job_id})
+    return _start_cli_job(["install", plugin_id, repo_url], "[INFO] Done", plugin_id=plugin_id)
+
+
+def _job_snapshot(job, since):
+    """Build the output payload for lines after offset 'since'. Caller must hold job["lock"]."""
+    # Walk back from the tail so a poll costs O(new lines), not O(buffered lines).
+    # A client that fell behind the buffer cap resumes from the oldest kept line.
+    start = max(since, job["base_offset"])
+    new_count = max(job["total"] - start, 0)
+    new_lines = list(itertools.islice(reversed(job["lines"]), new_count))[::-1]
+    return {
+        "success": True,
+        "lines": new_lines,
+        "offset": job["total"],
+        "done": job["done"],
+        "job_success": job["success"],
+        "error": job["error"],
+    }
 
 
 @plugin_manage_bp.route("/pluginmanager-api/job/<job_id>/output", methods=["GET"])
@@ -361,30 +643,107 @@ def job_output(job_id):
 
     since = request.args.get("since", 0, type=int)
     with job["lock"]:
-        new_lines = job["lines"][since:]
-        return jsonify({
-            "success": True,
-            "lines": new_lines,
-            "offset": since + len(new_lines),
-            "done": job["done"],
-            "job_success": job["success"],
-            "error": job["error"],
-        })
+        return jsonify(_job_snapshot(job, since))
+
+
+@plugin_manage_bp.route("/pluginmanager-api/job/<job_id>/stream", methods=["GET"])
+def job_stream(job_id):
+    """Stream background job output as Server-Sent Events for up to _STREAM_MAX_SECONDS.
+
+    Each event carries the same JSON payload as /output. A stream that runs out
+    of time before the job is done ends with a "reconnect" event, and the client
+    opens a new one from its current offset. Capping the stream keeps it from
+    pinning a server worker thread for the whole job. The polling endpoint stays
+    available for clients without EventSource support.
+    """
+    job = _get_job(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+
+    since = request.args.get("since", 0, type=int)
+
+    def generate():
+        offset = since
+        deadline = time.monotonic() + _STREAM_MAX_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield "event: reconnect\ndata: {}\n\n"
+                return
+            with job["cond"]:
+                ready = job["cond"].wait_for(
+                    lambda: job["total"] > offset or job["done"], timeout=remaining
+                )
+                payload = _job_snapshot(job, offset) if ready else None
+            if payload is None:
+                continue
+            offset = payload["offset"]
+            yield f"data: {json.dumps(payload)}\n\n"
+            if payload["done"]:
+                return
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+_CORE_CHANGES_MAX_AGE = 300
+
+
+def _load_core_changes_gzip():
+    """Gzip CORE_CHANGES.md once at import. Returns (body, etag, mtime) or None if unreadable."""
+    path = os.path.join(_PLUGIN_DIR, "CORE_CHANGES.md")
+    try:
+        with open(path, "rb") as f:
+            body = gzip.compress(f.read(), mtime=0)
+        return body, hashlib.sha1(body).hexdigest(), os.path.getmtime(path)
+    except OSError as e:
+        logger.warning(f"Could not precompress CORE_CHANGES.md: {e}")
+        return None
+
+
+_CORE_CHANGES_GZIP = _load_core_changes_gzip()
 
 
 @plugin_manage_bp.route("/pluginmanager-api/core-changes", methods=["GET"])
 def serve_core_changes():
-    """Serve the CORE_CHANGES.md file."""
-    try:
-        import os
-        md_path = os.path.join(os.path.dirname(__file__), "CORE_CHANGES.md")
-        if os.path.exists(md_path):
-            from flask import send_file
-            return send_file(md_path, mimetype='text/markdown', as_attachment=False)
-        else:
-            return jsonify({"error": "CORE_CHANGES.md not found"}), 404
-    except Exception as e:
-        logger.exception("Failed to serve CORE_CHANGES.md")
-        return jsonify({"error": str(e)}), 500
+    """Serve the CORE_CHANGES.md file.
+
+    Clients that accept gzip get the copy compressed at import; others get the file
+    itself via send_from_directory (which answers 404 if it is missing). Both carry
+    ETag/Last-Modified, so repeat visits within max_age are served from the browser
+    cache or as 304s.
+    """
+    if _CORE_CHANGES_GZIP and request.accept_encodings["gzip"]:
+        body, etag, mtime = _CORE_CHANGES_GZIP
+        response = Response(body, mimetype="text/markdown")
+        response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag)
+        response.last_modified = mtime
+        response.cache_control.max_age = _CORE_CHANGES_MAX_AGE
+        response = response.make_conditional(request)
+    else:
+        response = send_from_directory(
+            _PLUGIN_DIR, "CORE_CHANGES.md", mimetype="text/markdown", max_age=_CORE_CHANGES_MAX_AGE
+        )
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+_STATUS_MAX_AGE = 60
+
 
+@plugin_manage_bp.route("/pluginmanager-api/status", methods=["GET"])
+def patch_status():
+    """Report whether the core files are patched, from the memoized check.
 
+    The route only exists once the blueprint is registered (i.e. the core is
+    patched), so after an auto patch the settings page polls it to learn when the
+    restarted service is back.
+    """
+    is_patched, missing = check_core_patched_cached()
+    response = jsonify({"success": True, "is_patched": is_patched, "missing": missing})
+    response.cache_control.max_age = _STATUS_MAX_AGE
+    return response
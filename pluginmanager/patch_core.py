@@ -2,6 +2,8 @@
 
 import os
 import re
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -49,6 +51,44 @@ def check_core_patched():
     return len(missing) == 0, missing
 
 
+# check_core_patched() reads two core source files. Once they are patched that only
+# changes when core is reinstalled (which restarts the service), so a positive result
+# is kept for the process lifetime; a negative one is re-checked after a short TTL.
+_PATCH_STATUS_TTL = 30
+_patch_status_cache = {"ts": 0.0, "val": None}
+_patch_status_lock = threading.Lock()
+
+
+def check_core_patched_cached():
+    """Memoized check_core_patched(). Same return value.
+
+    If the core files cannot be read the core is reported as patched (and not
+    cached), matching how the settings page treated a failed check before.
+
+    Returns:
+        tuple: (is_patched: bool, missing_parts: list)
+    """
+    with _patch_status_lock:
+        val = _patch_status_cache["val"]
+        if val is not None and (val[0] or time.monotonic() - _patch_status_cache["ts"] < _PATCH_STATUS_TTL):
+            return val
+    try:
+        val = check_core_patched()
+    except (OSError, UnicodeDecodeError) as e:  # the only ways reading the core files can fail
+        logger.warning(f"Could not check patch status: {e}")
+        return True, []
+    with _patch_status_lock:
+        _patch_status_cache["ts"] = time.monotonic()
+        _patch_status_cache["val"] = val
+    return val
+
+
+def invalidate_patch_status():
+    """Drop the memoized patch status so the next check re-reads the core files."""
+    with _patch_status_lock:
+        _patch_status_cache["val"] = None
+
+
 def patch_core_files():
     """Patch core files to add blueprint registration support.
     
@@ -156,6 +196,7 @@ def register_plugin_blueprints(app):
                 f.write(inkypi_content)
             logger.info("Patched inkypi.py")
         
+        invalidate_patch_status()
         return True, None
         
     except Exception as e:
@@ -5,10 +5,138 @@ from PIL import Image
 import logging
 import os
 import subprocess
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Resolved once at load instead of on every get_blueprint()/settings render.
+# Guarded so a failing import only disables the feature, not the whole plugin.
+try:
+    from . import api as _api_module
+except ImportError as e:
+    logger.warning(f"Plugin manager API unavailable: {e}")
+    _api_module = None
+
+try:
+    from .patch_core import check_core_patched_cached
+except ImportError as e:
+    logger.warning(f"Could not load patch status check, assuming core is patched: {e}")
+
+    def check_core_patched_cached():
+        return True, []
+
+# Core plugins directory (src/plugins), static for the process lifetime
+try:
+    from config import Config
+    _PLUGINS_DIR = os.path.join(Config.BASE_DIR, "plugins")
+except ImportError:
+    _PLUGINS_DIR = None
+
+
+def _plugins_dir_mtime():
+    """mtime of the core plugins directory, or None if it cannot be read."""
+    if _PLUGINS_DIR is None:
+        return None
+    try:
+        return os.path.getmtime(_PLUGINS_DIR)
+    except OSError:
+        return None
+
+
+def _third_party_plugins(device_config):
+    """Third-party plugins and their version dates, cached on device_config._third_party."""
+    # Keyed on _plugins_rev, which the API bumps after each CLI job; until the first job
+    # sets it, on the plugins dir mtime (installs and uninstalls replace a folder there)
+    rev = getattr(device_config, "_plugins_rev", None)
+    key = rev if rev is not None else _plugins_dir_mtime()
+    cached = getattr(device_config, "_third_party", None)
+    if key is None or cached is None or cached["key"] != key:
+        cached = {
+            "key": key,
+            # Materialized as a tuple so the shared cached sequence cannot be resized by a caller
+            "plugins": tuple(p for p in device_config.get_plugins() if p.get("repository")),
+            # Each version date costs a `git log`, so they are kept alongside the list
+            "version_dates": {},
+        }
+        device_config._third_party = cached
+    return cached
+
+
+def _launch_patch(patch_script):
+    """Start patch-core.sh fire-and-forget with stdout/stderr discarded. Returns the child pid.
+
+    posix_spawn creates the child without Popen's fork + blocking errpipe read,
+    so the calling request thread is not stalled while bash starts.
+    """
+    file_actions = [
+        (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+        (os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY, 0),
+    ]
+    return os.posix_spawnp("bash", ["bash", patch_script], os.environ, file_actions=file_actions)
+
+
+# Shipped with the plugin, so its presence cannot change while the process runs
+_PATCH_SCRIPT = os.path.join(os.path.dirname(__file__), "patch-core.sh")
+_PATCH_SCRIPT_EXISTS = os.path.isfile(_PATCH_SCRIPT)
+
+# Single background worker for the auto patch, so the settings render never waits on process creation
+_PATCH_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pluginmanager-patch")
+_PATCH_STARTED = threading.Event()  # set once a launch is queued; cleared if the patch fails
+_PATCH_STARTED_LOCK = threading.Lock()
+
+
+def _run_patch(patch_script):
+    """Patch worker: spawn patch-core.sh and reap it so it does not linger as a zombie."""
+    try:
+        pid = _launch_patch(patch_script)
+        _, status = os.waitpid(pid, 0)
+    except Exception as e:
+        logger.warning(f"Could not start auto core patch: {e}")
+        _PATCH_STARTED.clear()  # allow a later render to retry
+        return
+    exit_code = os.waitstatus_to_exitcode(status)
+    if exit_code != 0:
+        logger.warning(f"Auto core patch exited with status {exit_code}")
+        _PATCH_STARTED.clear()  # allow a later render to retry
+
+
+def _submit_patch(patch_script):
+    """Queue the auto patch unless a launch is already queued or running."""
+    # Lock-free fast path for every render after the first
+    if _PATCH_STARTED.is_set():
+        return
+    # Whoever loses the race sees the winner's launch as already started
+    if not _PATCH_STARTED_LOCK.acquire(blocking=False):
+        return
+    try:
+        if not _PATCH_STARTED.is_set():
+            # Set before submitting: a fast failure clears it on the worker,
+            # and that clear must not be overwritten by a later set() here
+            _PATCH_STARTED.set()
+            try:
+                # A plain submit never blocks, so this is also safe from inside an event loop
+                _PATCH_EXECUTOR.submit(_run_patch, patch_script)
+            except Exception:
+                _PATCH_STARTED.clear()
+                raise
+    finally:
+        _PATCH_STARTED_LOCK.release()
+
+
+# (width, height) -> shared white placeholder; only a handful of resolutions ever occur
+_PLACEHOLDERS = {}
+
+
+def _white_image(width, height):
+    """Blank white placeholder, built once per resolution and shared (callers must not draw on it)."""
+    img = _PLACEHOLDERS.get((width, height))
+    if img is None:
+        # RGB, not 'L' or '1': colour panel drivers map the image straight onto their
+        # palette, and a grayscale white lands on an invalid palette index there
+        img = _PLACEHOLDERS[(width, height)] = Image.new('RGB', (width, height), color='white')
+    return img
+
 
 class PluginManager(BasePlugin):
     """Plugin for managing third-party plugins installation/uninstallation."""
@@ -16,18 +144,16 @@ class PluginManager(BasePlugin):
     @classmethod
     def get_blueprint(cls):
         """Return the Flask blueprint for this plugin's API routes."""
-        from . import api
-        return api.plugin_manage_bp
+        return _api_module.plugin_manage_bp if _api_module is not None else None
     
     @staticmethod
     def _get_plugin_last_commit_date(plugin_id):
         """Get the last commit date for a plugin from its local git repository."""
         try:
-            from flask import current_app
-            from config import Config
+            if _PLUGINS_DIR is None:
+                return None
             
-            plugins_dir = os.path.join(Config.BASE_DIR, "plugins")
-            plugin_dir = os.path.join(plugins_dir, plugin_id)
+            plugin_dir = os.path.join(_PLUGINS_DIR, plugin_id)
             git_dir = os.path.join(plugin_dir, ".git")
             
             if not os.path.isdir(git_dir):
@@ -58,65 +184,55 @@ class PluginManager(BasePlugin):
             from flask import current_app
             
             # Check if core files need patching FIRST
-            core_needs_patch = False
-            core_patch_missing = []
-            try:
-                from .patch_core import check_core_patched
-                is_patched, missing = check_core_patched()
-                core_needs_patch = not is_patched
-                core_patch_missing = missing
-            except Exception as e:
-                logger.warning(f"Could not check patch status: {e}")
-            
-            template_params['core_needs_patch'] = core_needs_patch
-            template_params['core_patch_missing'] = core_patch_missing
+            is_patched, core_patch_missing = check_core_patched_cached()
+            core_needs_patch = not is_patched
+            auto_patch_started = False
+            third_party = []
             
             # If core is not patched, trigger patch script in the background
             if core_needs_patch:
-                patch_script = os.path.join(os.path.dirname(__file__), "patch-core.sh")
-                if os.path.isfile(patch_script):
+                if _PATCH_SCRIPT_EXISTS:
                     try:
                         # Fire-and-forget: do not wait, service will restart during/after this call
-                        subprocess.Popen(
-                            ["bash", patch_script],
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL,
-                        )
-                        template_params['auto_patch_started'] = True
+                        _submit_patch(_PATCH_SCRIPT)
+                        auto_patch_started = True
                     except Exception as e:  # pragma: no cover - best-effort logging
                         logger.warning(f"Could not start auto core patch: {e}")
-                        template_params['auto_patch_started'] = False
                 else:
                     logger.warning("patch-core.sh not found for pluginmanager")
-                    template_params['auto_patch_started'] = False
-                
-                # Skip loading plugins when unpatched
-                template_params['third_party_plugins'] = []
+                # Skip loading plugins when unpatched (third_party stays empty)
             else:
                 # Core is patched, normal behaviour: load third-party plugins list
                 device_config = current_app.config.get('DEVICE_CONFIG')
                 if device_config:
-                    third_party = [p for p in device_config.get_plugins() if p.get("repository")]
-                    # Add version date (last commit date) to each plugin
+                    cached = _third_party_plugins(device_config)
+                    third_party = cached["plugins"]
+                    # Add version date (last commit date) to each plugin, running git only on a cache miss
+                    version_dates = cached["version_dates"]
                     for plugin in third_party:
                         plugin_id = plugin.get("id")
                         if plugin_id:
-                            version_date = self._get_plugin_last_commit_date(plugin_id)
-                            plugin['version_date'] = version_date or "Unknown"
-                    template_params['third_party_plugins'] = third_party
-                else:
-                    template_params['third_party_plugins'] = []
+                            if plugin_id not in version_dates:
+                                version_dates[plugin_id] = self._get_plugin_last_commit_date(plugin_id) or "Unknown"
+                            plugin['version_date'] = version_dates[plugin_id]
+            
+            template_params.update({
+                'core_needs_patch': core_needs_patch,
+                'core_patch_missing': core_patch_missing,
+                'third_party_plugins': third_party,
+                'auto_patch_started': auto_patch_started,
+            })
         except (RuntimeError, ImportError):
             # Not in Flask context or Flask not available
-            template_params['third_party_plugins'] = []
-            template_params['core_needs_patch'] = False
-            template_params['core_patch_missing'] = []
-            template_params['auto_patch_started'] = False
+            template_params.update({
+                'core_needs_patch': False,
+                'core_patch_missing': [],
+                'third_party_plugins': [],
+                'auto_patch_started': False,
+            })
         return template_params
     
     def generate_image(self, settings, device_config):
         """Return a placeholder image - this plugin is UI-only."""
-        # Create a simple placeholder image
         width, height = device_config.get_resolution()
-        img = Image.new('RGB', (width, height), color='white')
-        return img
+        return _white_image(width, height)